@@ -1,122 +1,595 @@
+import datetime
+import functools
 import os
 import json
 import re
+import shelve
+import numpy as np
 import pandas as pd
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 # --- SETUP & CONFIGURATION ---
 
 load_dotenv()
 API_KEY_CONFIGURED = "GOOGLE_API_KEY" in os.environ
-if API_KEY_CONFIGURED:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+
+_genai_module = None
+
+def _genai():
+    """
+    Imports and configures google.generativeai on first use. The import costs
+    a few hundred milliseconds of cold start, and offline runs (no API key,
+    regex fallback parser) never pay it at all.
+    """
+    global _genai_module
+    if _genai_module is None:
+        import google.generativeai as genai
+        if API_KEY_CONFIGURED:
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+        _genai_module = genai
+    return _genai_module
 
 # --- DATA HANDLING ---
 
+CSV_PATH = 'data/merged_property_dataset.csv'
+PARQUET_PATH = 'data/merged_property_dataset.parquet'
+
+# float32 halves the memory of the default float64 and doubles throughput of
+# the vectorized price/BHK comparisons; the values fit comfortably. The
+# integer-valued columns use nullable ints — pincode/bathrooms parse as ints
+# directly, balcony arrives as "1.0"-style floats and is downcast after read.
+NUMERIC_DTYPES = {
+    'bhk': 'float32',
+    'price_cr': 'float32',
+    'pincode': 'Int32',
+    'balcony': 'float32',
+    'bathrooms': 'Int16',
+}
+
 def load_data():
-    """Loads and preprocesses the property dataset from a CSV file."""
+    """
+    Loads and preprocesses the property dataset.
+
+    The first load parses the CSV, preprocesses it, and writes a Parquet
+    sidecar next to it; later loads read the typed columnar file directly,
+    skipping both the text parse and the numeric coercion loop.
+    """
     try:
-        df = pd.read_csv('data/merged_property_dataset.csv')
-        # Pre-process columns for efficient searching
-        df['city_lower'] = df['city'].str.lower()
-        df['status_lower'] = df['possession_status'].str.lower()
-        
-        for col in ['bhk', 'price_cr', 'pincode', 'balcony', 'bathrooms']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        if os.path.exists(PARQUET_PATH) and os.path.getmtime(PARQUET_PATH) >= os.path.getmtime(CSV_PATH):
+            return pd.read_parquet(PARQUET_PATH)
+
+        # Typed at parse time: the C parser writes the narrow dtypes on its
+        # single pass, replacing the old per-column to_numeric reparses.
+        # Int16 (not Int8) for balcony/bathrooms: the data contains outliers
+        # like 987 that would overflow a signed byte.
+        df = pd.read_csv(CSV_PATH, dtype=NUMERIC_DTYPES, na_values=['', 'NA', 'N/A'])
+        df['balcony'] = df['balcony'].astype('Int16')
+        # Pre-process columns for efficient searching. Categorical storage
+        # turns the per-query equality checks into integer-code compares and
+        # shrinks the columns to one small int per row plus the tiny
+        # category table.
+        df['city_lower'] = df['city'].str.lower().astype('category')
+        df['status_lower'] = df['possession_status'].str.lower().astype('category')
+
+        # Card display fields, precomputed vectorized so the render loop does
+        # no per-cell int()/notna work on Streamlit reruns.
+        df['pincode_str'] = df['pincode'].astype(str).replace('<NA>', 'N/A')
+        df['bhk_str'] = df['bhk'].fillna(0).astype(int).astype(str)
+        df['balcony_str'] = df['balcony'].fillna(0).astype(int).astype(str)
+        ready = df['possession_status'].str.contains('Ready', na=False)
+        df['status_badge'] = np.where(ready, '✅', '⏳')
+
+        # Sorted (city, bhk, price) order is what makes the group index and
+        # the per-group price bisection in search_properties valid.
+        df = df.sort_values(['city_lower', 'bhk', 'price_cr']).reset_index(drop=True)
+
+        try:
+            df.to_parquet(PARQUET_PATH, engine='pyarrow', compression='zstd')
+        except Exception:
+            pass  # e.g. read-only filesystem; the CSV path still works
         return df
     except FileNotFoundError:
         # The main app will handle displaying the error to the user.
         return None
 
+def build_search_index(df):
+    """
+    Builds the search acceleration structures over the loaded frame:
+
+    - 'groups': (city_lower, bhk) -> ndarray of row positions, a hash lookup
+      replacing the city/BHK boolean masks.
+    - 'by_city' / 'by_bhk': single-key variants of the same, so a query that
+      constrains only one of the two is a direct dict hit instead of a scan
+      over the joint keys.
+    - 'price_order' / 'price_sorted': row positions ordered by price and the
+      prices in that order, so a budget range is two binary searches instead
+      of two full-column comparisons.
+    """
+    price = df['price_cr'].to_numpy()
+    price_order = np.argsort(price, kind='stable')
+    city_cat = df['city_lower'].cat
+    return {
+        'groups': df.groupby(['city_lower', 'bhk'], sort=False, observed=True).indices,
+        'by_city': {category: np.flatnonzero(city_cat.codes.to_numpy() == code)
+                    for code, category in enumerate(city_cat.categories)},
+        'by_bhk': df.groupby('bhk', sort=False).indices,
+        'price_order': price_order,
+        'price_sorted': price[price_order],
+    }
+
 # --- AI & SEARCH LOGIC ---
 
-def parse_query_with_context(chat_history, last_filters):
+SEARCH_INTENT_KEYWORDS = [
+    "bhk", "bedroom", "flat", "apartment", "property", "properties", "house",
+    "home", "buy", "rent", "budget", "cr", "crore", "lakh", "price", "under",
+    "between", "ready", "possession", "construction", "pincode", "search",
+]
+
+# Compiled once at import: one linear scan over the message instead of a
+# separate substring walk per keyword on every turn.
+_SEARCH_INTENT_RE = re.compile("|".join(map(re.escape, SEARCH_INTENT_KEYWORDS)))
+
+def is_search_query(text, known_cities=()):
+    """
+    Returns True when the message looks like a property-search request:
+    either it contains a domain keyword, or it names a city present in the
+    dataset ("anything in pune" carries no keyword but is clearly a search).
+    Only messages matching neither get the canned no-search nudge.
+    """
+    text_lower = text.lower()
+    if _SEARCH_INTENT_RE.search(text_lower) is not None:
+        return True
+    return any(city in text_lower for city in known_cities)
+
+# Acknowledgement/"show more" openers that carry no new search criteria; when
+# filters already exist these turns can reuse them without another LLM parse.
+_GREETING_RE = re.compile(
+    r'^(hi|hello|hey|thanks|thank you|ok|okay|cool|great|more|show more|another|next)\b',
+    re.IGNORECASE,
+)
+
+def is_followup_acknowledgement(text):
+    """True for greetings/acknowledgements that add no new search criteria."""
+    return _GREETING_RE.match(text.strip()) is not None
+
+# Compiled once at module scope so each call pays only the match, not the
+# pattern parse/compile-cache lookup.
+_RANGE_RE = re.compile(r'between\s*([\d.]+)\s*(?:and|to|-)\s*([\d.]+)\s*cr', re.IGNORECASE)
+_UNDER_RE = re.compile(r'(?:under|below)\s*([\d.]+)\s*cr', re.IGNORECASE)
+_BHK_RE = re.compile(r'(\d+(?:\.\d+)?)\s*bhk', re.IGNORECASE)
+
+# Tokens that carry no filter information; anything else left over after the
+# pattern matches means the query is too rich for the local fast path.
+_FILLER_WORDS = frozenset({
+    'show', 'me', 'a', 'an', 'the', 'in', 'at', 'near', 'for', 'find',
+    'search', 'want', 'need', 'buy', 'please', 'and', 'with', 'flat',
+    'flats', 'apartment', 'apartments', 'property', 'properties', 'house',
+    'houses', 'home', 'homes', 'options', 'something',
+})
+
+def fast_parse(latest_query, last_filters, known_cities):
+    """
+    Local fast-path parse for simple queries like "2bhk in pune under 2cr".
+
+    Returns the complete filter dict when a city is known and every
+    meaningful token of the query was consumed by the BHK/budget/city
+    patterns, so the Gemini parser can be skipped outright. Returns None
+    when anything unrecognized remains — those queries need the LLM.
+    """
+    working = latest_query.lower()
+    filters = dict(last_filters or {})
+
+    if match := _RANGE_RE.search(working):
+        filters['budget_min_cr'] = float(match.group(1))
+        filters['budget_max_cr'] = float(match.group(2))
+        working = working.replace(match.group(0), ' ')
+    elif match := _UNDER_RE.search(working):
+        filters['budget_max_cr'] = float(match.group(1))
+        working = working.replace(match.group(0), ' ')
+    if match := _BHK_RE.search(working):
+        filters['bhk_list'] = [float(match.group(1))]
+        working = working.replace(match.group(0), ' ')
+    for city in known_cities:
+        if city in working:
+            filters['city'] = city
+            working = working.replace(city, ' ')
+            break
+
+    leftovers = [token for token in re.findall(r'[a-z0-9]+', working)
+                 if token not in _FILLER_WORDS]
+    if leftovers or not filters.get('city'):
+        return None
+    return filters
+
+def fallback_regex_parser(latest_query, last_filters):
+    """
+    Best-effort local parse of BHK and budget used when the Gemini call is
+    unavailable (no API key) or fails. Starts from the previous filters so
+    context such as the city survives a refinement like "under 2cr".
+    """
+    filters = dict(last_filters or {})
+    if match := _BHK_RE.search(latest_query):
+        filters['bhk_list'] = [float(match.group(1))]
+    if match := _RANGE_RE.search(latest_query):
+        filters['budget_min_cr'] = float(match.group(1))
+        filters['budget_max_cr'] = float(match.group(2))
+    elif match := _UNDER_RE.search(latest_query):
+        filters['budget_max_cr'] = float(match.group(1))
+    return filters
+
+EXTRACTION_SCHEMA = {
+    "name": "find_properties", "description": "Extracts filters for a property search.",
+    "parameters": {
+        "type": "OBJECT", "properties": {
+            "city": {"type": "STRING"}, "bhk_list": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+            "budget_min_cr": {"type": "NUMBER"}, "budget_max_cr": {"type": "NUMBER"},
+            "status_list": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "preamble_summary": {"type": "STRING"}
+        }, "required": ["city", "bhk_list", "budget_min_cr", "budget_max_cr", "status_list"]
+    }
+}
+
+PARSER_INSTRUCTIONS = """
+You are an expert real estate query parser. Your goal is to extract search filters from the user's latest message, using the conversation history and previous filters as context.
+
+Rules:
+- From the LATEST user message, extract new information.
+- If a user provides a new value (e.g., a new city), overwrite the old one.
+- If a user adds a new filter (e.g., a budget), add it to existing filters.
+- Budget: "between X and Y Cr" -> budget_min_cr: X, budget_max_cr: Y. "under Y Cr" -> budget_max_cr: Y.
+- ALWAYS return a value for every field, using the previous filter's value if it hasn't changed.
+- Also set `preamble_summary`: a friendly 2-sentence introduction for the matching properties. Do NOT mention how many properties were found.
+
+Call the `find_properties` function with the complete, updated set of filters.
+"""
+
+# How many recent chat turns ride along in the parser prompt. last_filters
+# already carries the cumulative search state, so the schema really only
+# needs the latest exchange plus a little phrasing context; older turns
+# only add tokens.
+HISTORY_WINDOW = 4
+
+SUMMARY_INSTRUCTIONS = (
+    "You summarize real estate search results for a user. Write a 2-3 sentence summary. "
+    "CRITICAL: Do NOT mention the total number of properties found. Just describe what you see."
+)
+
+# What the summary model actually needs to see per sampled row — all string
+# columns, so the sample serializes with plain json and few prompt tokens.
+SUMMARY_FIELDS = ['projectName', 'landmark', 'price_formatted', 'bhk_str', 'possession_status']
+
+# Pinned generation settings. The parser emits a single function call, the
+# summary a 2-3 sentence blurb — capping output tokens bounds decoding time,
+# and temperature 0 on the parser makes identical prompts return identical
+# filters, so the lru_cache/st.cache_data layers are semantically safe.
+# The parser cap must leave room for the filters PLUS the two-sentence
+# preamble_summary inside the function-call args; a MAX_TOKENS truncation
+# there drops the function call and silently downgrades the turn to the
+# regex fallback.
+PARSER_GENERATION_CONFIG = {'temperature': 0, 'max_output_tokens': 256, 'candidate_count': 1}
+SUMMARY_GENERATION_CONFIG = {'temperature': 0.2, 'max_output_tokens': 180}
+
+# Handle to the server-side CachedContent holding the static parser context,
+# and the model bound to it. Created lazily because context caching needs the
+# API key and may be unavailable (unsupported tier, prompt below the minimum
+# cacheable size); constructed once because model construction re-validates
+# the tool schema on every instantiation.
+_parser_cached_content = None
+_parser_model = None
+_parser_cache_expiry = None
+
+_PARSER_CACHE_TTL = datetime.timedelta(hours=1)
+# Recreate a little early so no turn ever lands on a just-expired context.
+_PARSER_CACHE_SLACK = datetime.timedelta(minutes=5)
+
+def _get_parser_model():
+    """
+    Returns the singleton model bound to the static parser instructions and
+    tool schema.
+
+    The static block never changes between turns, so it is registered once as
+    a Gemini CachedContent resource; each call then uploads only the small
+    dynamic payload (previous filters + history tail). The handle is
+    recreated shortly before its TTL runs out, and a plain model carrying the
+    same system instruction is used when caching is unavailable.
+    """
+    global _parser_cached_content, _parser_model, _parser_cache_expiry
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if _parser_model is not None and (_parser_cache_expiry is None
+                                      or now < _parser_cache_expiry - _PARSER_CACHE_SLACK):
+        return _parser_model
+    genai = _genai()
+    try:
+        _parser_cached_content = genai.caching.CachedContent.create(
+            model="models/gemini-2.5-flash",
+            system_instruction=PARSER_INSTRUCTIONS,
+            tools=[EXTRACTION_SCHEMA],
+            ttl=_PARSER_CACHE_TTL,
+        )
+        _parser_cache_expiry = now + _PARSER_CACHE_TTL
+        _parser_model = genai.GenerativeModel.from_cached_content(
+            cached_content=_parser_cached_content,
+            generation_config=PARSER_GENERATION_CONFIG,
+        )
+    except Exception:
+        _parser_cached_content = None
+        _parser_cache_expiry = None
+        _parser_model = genai.GenerativeModel(
+            model_name="gemini-2.5-flash",
+            tools=[EXTRACTION_SCHEMA],
+            system_instruction=PARSER_INSTRUCTIONS,
+            generation_config=PARSER_GENERATION_CONFIG,
+        )
+    return _parser_model
+
+@functools.lru_cache(maxsize=None)
+def _get_summary_model():
+    """Returns the singleton summary model, constructed on first use."""
+    return _genai().GenerativeModel(
+        'gemini-2.5-flash',
+        system_instruction=SUMMARY_INSTRUCTIONS,
+        generation_config=SUMMARY_GENERATION_CONFIG,
+    )
+
+@functools.lru_cache(maxsize=512)
+def _cached_parse_call(prompt):
+    """
+    Runs the filter-extraction call against Gemini and returns the sanitized
+    filters as a JSON string. Cached on the prompt, which already encodes the
+    conversation history and previous filters, so a repeated turn (rerun,
+    re-click, identical greeting) skips the network round-trip entirely.
+    """
+    # Stream the response and bail out at the first chunk carrying the
+    # function call, so the DataFrame filter can start without waiting for
+    # the stream to finish.
+    response = _get_parser_model().generate_content(prompt, stream=True)
+    for chunk in response:
+        if not chunk.candidates:
+            continue
+        for part in chunk.candidates[0].content.parts:
+            if part.function_call:
+                raw_filters = part.function_call.args
+
+                # Sanitize the AI's response to prevent JSON serialization errors
+                sanitized_filters = {}
+                for key, value in raw_filters.items():
+                    sanitized_filters[key] = list(value) if hasattr(value, '__iter__') and not isinstance(value, str) else value
+                return json.dumps(sanitized_filters)
+    return None
+
+@functools.lru_cache(maxsize=512)
+def _cached_summary_call(prompt):
+    """Runs a plain text-generation call against Gemini, cached on the prompt."""
+    return _get_summary_model().generate_content(prompt).text
+
+def parse_query_with_context(chat_history, last_filters, formatted_history=None):
     """
     Uses the Gemini API to parse a user's query into structured search filters,
-    maintaining the context of the conversation.
+    maintaining the context of the conversation. Falls back to a local regex
+    parse when the API is unavailable.
+
+    `last_filters` is supplied by the caller (the app keeps it in a session
+    slot updated as messages are appended) rather than recovered by scanning
+    the history. Callers that also maintain the formatted history window
+    incrementally can pass it as `formatted_history` to skip the rebuild.
     """
+    latest_query = chat_history[-1]['content'] if chat_history else ""
     if not API_KEY_CONFIGURED:
-        return {}
+        return fallback_regex_parser(latest_query, last_filters)
 
-    formatted_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
+    if formatted_history is None:
+        # Cap the prompt to the recent turns; token count (and latency/cost)
+        # otherwise grows linearly with conversation length.
+        recent = chat_history[-HISTORY_WINDOW:]
+        formatted_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent])
+        if len(chat_history) > HISTORY_WINDOW:
+            formatted_history = f"[Earlier: user searched for {json.dumps(last_filters)}]\n" + formatted_history
 
+    # Only the dynamic payload is sent per turn; the instruction block and
+    # tool schema ride along via the cached parser context.
     prompt = f"""
-    You are an expert real estate query parser. Your goal is to extract search filters from the user's latest message, using the conversation history and previous filters as context.
-
     Previous Filters: {json.dumps(last_filters)}
     Conversation History:
     {formatted_history}
-
-    Rules:
-    - From the LATEST user message, extract new information.
-    - If a user provides a new value (e.g., a new city), overwrite the old one.
-    - If a user adds a new filter (e.g., a budget), add it to existing filters.
-    - Budget: "between X and Y Cr" -> budget_min_cr: X, budget_max_cr: Y. "under Y Cr" -> budget_max_cr: Y.
-    - ALWAYS return a value for every field, using the previous filter's value if it hasn't changed.
-
-    Call the `find_properties` function with the complete, updated set of filters.
-    """
-    
-    extraction_schema = {
-        "name": "find_properties", "description": "Extracts filters for a property search.",
-        "parameters": {
-            "type": "OBJECT", "properties": {
-                "city": {"type": "STRING"}, "bhk_list": {"type": "ARRAY", "items": {"type": "NUMBER"}},
-                "budget_min_cr": {"type": "NUMBER"}, "budget_max_cr": {"type": "NUMBER"},
-                "status_list": {"type": "ARRAY", "items": {"type": "STRING"}}
-            }, "required": ["city", "bhk_list", "budget_min_cr", "budget_max_cr", "status_list"]
-        }
-    }
+    """
 
     try:
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash", tools=[extraction_schema])
-        response = model.generate_content(prompt)
-        
-        if response.candidates and response.candidates[0].content.parts[0].function_call:
-            raw_filters = response.candidates[0].content.parts[0].function_call.args
-            
-            # Sanitize the AI's response to prevent JSON serialization errors
-            sanitized_filters = {}
-            for key, value in raw_filters.items():
-                sanitized_filters[key] = list(value) if hasattr(value, '__iter__') and not isinstance(value, str) else value
-            return sanitized_filters
+        serialized = _cached_parse_call(prompt)
+        if serialized is not None:
+            return json.loads(serialized)
     except Exception as e:
+        # The cached context may simply have expired; drop the handle and its
+        # model so the next turn recreates them.
+        global _parser_cached_content, _parser_model
+        _parser_cached_content = None
+        _parser_model = None
         print(f"AI parsing error: {e}")
-    return {}
+    return fallback_regex_parser(latest_query, last_filters)
+
+def _search_with_index(df, filters, index):
+    """Index-backed search: hash lookups for city/BHK, bisection for budget."""
+    city = filters.get('city') or None
+    bhk_values = [float(b) for b in filters.get('bhk_list') or []]
+
+    candidates = None
+    if city and bhk_values:
+        groups = index['groups']
+        arrays = [groups[(city, bhk)] for bhk in bhk_values if (city, bhk) in groups]
+        if not arrays:
+            return df.iloc[0:0]
+        candidates = np.concatenate(arrays)
+    elif city:
+        candidates = index['by_city'].get(city)
+        if candidates is None:
+            return df.iloc[0:0]
+    elif bhk_values:
+        by_bhk = index['by_bhk']
+        arrays = [by_bhk[bhk] for bhk in bhk_values if bhk in by_bhk]
+        if not arrays:
+            return df.iloc[0:0]
+        candidates = np.concatenate(arrays)
 
-def search_properties(df, filters):
-    """Filters the master DataFrame based on the extracted criteria."""
+    budget_min = filters.get('budget_min_cr')
+    budget_max = filters.get('budget_max_cr')
+    candidates_sorted = False
+    if budget_min or budget_max:
+        price_sorted = index['price_sorted']
+        # NaN prices sort to the tail; cap the default upper bound before
+        # them so an open-ended minimum matches the mask path's >= semantics.
+        n_priced = np.searchsorted(price_sorted, np.inf, side='right')
+        lo = np.searchsorted(price_sorted, budget_min, side='left') if budget_min else 0
+        hi = np.searchsorted(price_sorted, budget_max, side='right') if budget_max else n_priced
+        in_budget = index['price_order'][lo:hi]
+        if candidates is None:
+            candidates = in_budget
+        else:
+            candidates = np.intersect1d(candidates, in_budget, assume_unique=True)
+            candidates_sorted = True  # intersect1d returns a sorted array
+
+    if candidates is None:
+        return df
+    return df.iloc[candidates if candidates_sorted else np.sort(candidates)]
+
+def search_properties(df, filters, index=None):
+    """
+    Filters the master DataFrame based on the extracted criteria.
+
+    With an `index` from build_search_index, city/BHK selection is a hash
+    lookup and the budget range two binary searches on the price-sorted
+    order, intersected in NumPy — no full-column boolean scan happens.
+    Without one, the original boolean-mask path is used.
+    """
     if df is None or not filters:
         return pd.DataFrame()
-    
-    results = df.copy()
-    
+
+    # Normalize the city once up front; both search paths compare against the
+    # pre-lowercased city_lower column and need no further string work.
+    if filters.get('city'):
+        filters = {**filters, 'city': filters['city'].lower()}
+
+    if index is not None:
+        return _search_with_index(df, filters, index)
+
+    # Fallback path: one combined boolean mask over the raw column arrays and
+    # a single indexing pass — no intermediate DataFrames.
+    mask = np.ones(len(df), dtype=bool)
     if city := filters.get('city'):
-        results = results[results['city_lower'] == city.lower()]
+        # Compare categorical codes directly: one int-vs-int vector pass, and
+        # a city absent from the data resolves without touching the rows.
+        city_cat = df['city_lower'].cat
+        try:
+            code = city_cat.categories.get_loc(city)
+        except KeyError:
+            return df.iloc[0:0]
+        mask &= city_cat.codes.to_numpy() == code
     if bhk_list := filters.get('bhk_list'):
-        results = results[results['bhk'].isin([float(b) for b in bhk_list])]
+        mask &= np.isin(df['bhk'].to_numpy(), np.asarray(bhk_list, dtype=np.float32))
     if budget_min := filters.get('budget_min_cr'):
-        results = results[results['price_cr'] >= budget_min]
+        mask &= df['price_cr'].to_numpy() >= budget_min
     if budget_max := filters.get('budget_max_cr'):
-        results = results[results['price_cr'] <= budget_max]
-        
-    return results
+        mask &= df['price_cr'].to_numpy() <= budget_max
+
+    return df[mask]
+
+# Disk-backed cache of summaries for popular searches, prewarmed offline by
+# prewarm_summaries.py. Query traffic is heavily skewed toward a few
+# (city, bhk, budget) combinations; hits here skip the Gemini call entirely.
+SUMMARY_CACHE_PATH = 'data/summary_cache'
+
+def canonical_filter_key(filters):
+    """
+    Normalizes parsed filters into a stable cache-key string: lowercased
+    city, sorted float BHKs, explicit budget bounds. Equivalent filter dicts
+    from the LLM parser, the regex fallback, and the prewarm script all map
+    to the same key.
+    """
+    filters = filters or {}
+    return json.dumps({
+        'city': str(filters.get('city') or '').lower(),
+        'bhk_list': sorted(float(b) for b in filters.get('bhk_list') or []),
+        'budget_min_cr': filters.get('budget_min_cr'),
+        'budget_max_cr': filters.get('budget_max_cr'),
+    }, sort_keys=True)
+
+def lookup_prewarmed_summary(filters):
+    """Returns the prewarmed summary for these filters, or None on a miss."""
+    try:
+        with shelve.open(SUMMARY_CACHE_PATH, flag='r') as cache:
+            return cache.get(canonical_filter_key(filters))
+    except Exception:
+        # No cache file yet (or an unreadable one) just means a miss.
+        return None
+
+def store_prewarmed_summary(filters, summary):
+    """Persists a summary for these filters into the disk cache."""
+    with shelve.open(SUMMARY_CACHE_PATH) as cache:
+        cache[canonical_filter_key(filters)] = summary
 
-def generate_summary(user_query, results_df):
-    """Generates a grounded, natural language summary of the search results."""
+def _template_summary(filters):
+    """Builds a summary line locally from the filters — no LLM round-trip."""
+    filters = filters or {}
+    description = "properties"
+    if bhk_list := filters.get('bhk_list'):
+        description = "/".join(str(int(b)) for b in bhk_list) + " BHK options"
+    line = f"Here are a few {description}"
+    if city := filters.get('city'):
+        line += f" in {str(city).title()}"
+    if filters.get('budget_min_cr') or filters.get('budget_max_cr'):
+        line += " within your budget"
+    return line + ". Take a look at the details below."
+
+def _stream_with_fallback(response):
+    """
+    Yields the text of each streamed chunk, catching errors raised during
+    iteration. The generator body runs inside st.write_stream, long after
+    generate_summary's own try block has returned, so a transient API error
+    mid-stream (or the ValueError a blocked chunk raises from `.text`) must
+    be handled here to degrade to the canned line instead of crashing the
+    turn.
+    """
+    emitted = False
+    try:
+        for chunk in response:
+            yield chunk.text
+            emitted = True
+    except Exception as e:
+        print(f"Summary generation failed: {e}")
+        if not emitted:
+            yield "Here are the properties I found based on your search."
+
+def generate_summary(user_query, results_df, preamble=None, stream=False, filters=None):
+    """
+    Generates a grounded, natural language summary of the search results.
+
+    When the parser call already produced a `preamble_summary` (one Gemini
+    round-trip instead of two), it is used directly, and handfuls of results
+    are described by a local template — the LLM call is reserved for result
+    sets worth describing. With stream=True that call returns a generator of
+    text chunks (for st.write_stream) so the first tokens reach the user
+    without waiting for the full completion.
+    """
+    if preamble:
+        return preamble
     if not API_KEY_CONFIGURED or results_df.empty:
         return "Here are the properties I found based on your search criteria."
+    if len(results_df) < 4:
+        return _template_summary(filters)
+    if (prewarmed := lookup_prewarmed_summary(filters)) is not None:
+        return prewarmed
 
+    # Serialize only the whitelisted string columns of the first rows:
+    # json.dumps over a small records list beats DataFrame.to_json on the
+    # full row width, and the smaller sample also means fewer prompt tokens.
+    sample = json.dumps(results_df.iloc[:3][SUMMARY_FIELDS].to_dict('records'))
     prompt = f"""
     A user asked: "{user_query}". I found some properties. Here is a sample:
-    {results_df.head(3).to_json(orient='records')}
-    Write a 2-3 sentence summary. CRITICAL: Do NOT mention the total number of properties found. Just describe what you see.
+    {sample}
     """
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        if stream:
+            response = _get_summary_model().generate_content(prompt, stream=True)
+            return _stream_with_fallback(response)
+        return _cached_summary_call(prompt)
     except Exception as e:
         print(f"Summary generation failed: {e}")
         return "Here are the properties I found based on your search."
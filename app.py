@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
 import json
-import re
+
+import ai_core
+from ai_core import (
+    API_KEY_CONFIGURED,
+    generate_summary,
+    is_followup_acknowledgement,
+    is_search_query,
+    parse_query_with_context,
+    search_properties,
+)
 
 # --- 1. CONFIGURATION & SETUP ---
 
@@ -14,125 +19,54 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load environment variables for the API key
-load_dotenv()
-API_KEY_CONFIGURED = "GOOGLE_API_KEY" in os.environ
-if API_KEY_CONFIGURED:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-
-# --- 2. DATA & AI CORE FUNCTIONS ---
+# --- 2. DATA ACCESS ---
 
-@st.cache_data(show_spinner="Loading property data...")
+@st.cache_resource(show_spinner="Loading property data...")
 def load_data():
-    """Loads and preprocesses the property dataset from a CSV file."""
-    try:
-        df = pd.read_csv('data/merged_property_dataset.csv')
-        # Pre-process columns for efficient searching
-        df['city_lower'] = df['city'].str.lower()
-        df['status_lower'] = df['possession_status'].str.lower()
-        
-        for col in ['bhk', 'price_cr', 'pincode', 'balcony', 'bathrooms']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        return df
-    except FileNotFoundError:
-        st.error("`data/merged_property_dataset.csv` not found. Please follow the setup instructions in README.md.")
-        return None
-
-def parse_query_with_context(chat_history):
     """
-    Uses the Gemini API to parse a user's query into structured search filters,
-    maintaining the context of the conversation.
+    Loads the preprocessed property dataset via ai_core as a process-wide
+    singleton. cache_resource hands every session the same object with no
+    per-retrieval serialization; nothing downstream mutates the frame (the
+    search paths only read it), so sharing it is safe.
     """
-    if not API_KEY_CONFIGURED:
-        return {}
-
-    # Find the most recent set of filters from the chat history for context
-    last_filters = next((msg.get('filters', {}) for msg in reversed(st.session_state.get('messages', [])) if msg.get('filters')), {})
-    
-    formatted_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
-
-    prompt = f"""
-    You are an expert real estate query parser. Your goal is to extract search filters from the user's latest message, using the conversation history and previous filters as context.
-
-    Previous Filters: {json.dumps(last_filters)}
-    Conversation History:
-    {formatted_history}
-
-    Rules:
-    - From the LATEST user message, extract new information.
-    - If a user provides a new value (e.g., a new city), overwrite the old one.
-    - If a user adds a new filter (e.g., a budget), add it to existing filters.
-    - Budget: "between X and Y Cr" -> budget_min_cr: X, budget_max_cr: Y. "under Y Cr" -> budget_max_cr: Y.
-    - ALWAYS return a value for every field, using the previous filter's value if it hasn't changed.
-
-    Call the `find_properties` function with the complete, updated set of filters.
+    return ai_core.load_data()
+
+@st.cache_resource(show_spinner=False)
+def load_search_index():
+    """Builds the (city, bhk) / price search index over the shared dataset."""
+    df = load_data()
+    return ai_core.build_search_index(df) if df is not None else None
+
+@st.cache_resource(show_spinner=False)
+def known_cities():
+    """The dataset's lowercased city names, for the local fast-path parser."""
+    df = load_data()
+    return tuple(df['city_lower'].cat.categories) if df is not None else ()
+
+@st.cache_data(ttl=600, max_entries=256, show_spinner=False)
+def cached_parse(latest_query, history_window, last_filters_json):
     """
-    
-    extraction_schema = {
-        "name": "find_properties", "description": "Extracts filters for a property search.",
-        "parameters": {
-            "type": "OBJECT", "properties": {
-                "city": {"type": "STRING"}, "bhk_list": {"type": "ARRAY", "items": {"type": "NUMBER"}},
-                "budget_min_cr": {"type": "NUMBER"}, "budget_max_cr": {"type": "NUMBER"},
-                "status_list": {"type": "ARRAY", "items": {"type": "STRING"}}
-            }, "required": ["city", "bhk_list", "budget_min_cr", "budget_max_cr", "status_list"]
-        }
-    }
-
-    try:
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash", tools=[extraction_schema])
-        response = model.generate_content(prompt)
-        
-        if response.candidates and response.candidates[0].content.parts[0].function_call:
-            raw_filters = response.candidates[0].content.parts[0].function_call.args
-            
-            # Sanitize the AI's response to prevent JSON serialization errors
-            sanitized_filters = {}
-            for key, value in raw_filters.items():
-                sanitized_filters[key] = list(value) if hasattr(value, '__iter__') and not isinstance(value, str) else value
-            return sanitized_filters
-    except Exception as e:
-        st.error(f"An error occurred with the AI model: {e}")
-    return {}
-
-def search_properties(df, filters):
-    """Filters the master DataFrame based on the extracted criteria."""
-    if df is None or not filters:
-        return pd.DataFrame()
-    
-    results = df.copy()
-    
-    if city := filters.get('city'):
-        results = results[results['city_lower'] == city.lower()]
-    if bhk_list := filters.get('bhk_list'):
-        results = results[results['bhk'].isin([float(b) for b in bhk_list])]
-    if budget_min := filters.get('budget_min_cr'):
-        results = results[results['price_cr'] >= budget_min]
-    if budget_max := filters.get('budget_max_cr'):
-        results = results[results['price_cr'] <= budget_max]
-        
-    return results
-
-def generate_summary(user_query, results_df):
-    """Generates a grounded, natural language summary of the search results."""
-    if not API_KEY_CONFIGURED or results_df.empty:
-        return "Here are the properties I found based on your search criteria."
-
-    prompt = f"""
-    A user asked: "{user_query}". I found some properties. Here is a sample:
-    {results_df.head(3).to_json(orient='records')}
-    Write a 2-3 sentence summary. CRITICAL: Do NOT mention the total number of properties found. Just describe what you see.
+    Client-side cache over the Gemini parse, keyed on the exact conversation
+    context. Widget-triggered Streamlit reruns and repeated queries with
+    identical context resolve here with zero latency and zero cost; the TTL
+    keeps stale conversations from pinning memory across sessions.
     """
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Summary generation failed: {e}")
-        return "Here are the properties I found based on your search."
+    return parse_query_with_context(
+        [{'role': 'user', 'content': latest_query}],
+        json.loads(last_filters_json),
+        history_window,
+    )
 
 # --- 3. UI COMPONENTS ---
 
+# The only columns a property card actually renders; materializing just these
+# keeps to_dict('records') (and session state) from dragging the whole row
+# through Python dicts. The *_str fields are preformatted at load time.
+CARD_FIELDS = ['projectName', 'landmark', 'pincode_str', 'price_formatted',
+               'bhk_str', 'balcony_str', 'possession_status', 'status_badge']
+
+RESULTS_PER_PAGE = 6
+
 def render_sidebar():
     """Renders the sidebar for navigation and actions."""
     with st.sidebar:
@@ -146,76 +80,171 @@ def display_property_card(card_data, container):
     """Renders a single, detailed property card within a specified container."""
     with container:
         st.subheader(card_data.get('projectName', 'N/A'))
-        st.caption(f"📍 {card_data.get('landmark', 'N/A')} | Pincode: {int(card_data.get('pincode', 0)) if pd.notna(card_data.get('pincode')) else 'N/A'}")
+        st.caption(f"📍 {card_data.get('landmark', 'N/A')} | Pincode: {card_data.get('pincode_str', 'N/A')}")
         st.markdown("---")
 
         sub_cols = st.columns(3)
         sub_cols[0].metric("Price", card_data.get('price_formatted', 'N/A'))
-        sub_cols[1].metric("BHK", f"{int(card_data.get('bhk', 0))}")
-        sub_cols[2].metric("Balconies", f" {int(card_data.get('balcony', 0))}")
+        sub_cols[1].metric("BHK", card_data.get('bhk_str', '0'))
+        sub_cols[2].metric("Balconies", card_data.get('balcony_str', '0'))
 
+        # The badge icon is a precomputed column, so the render loop is
+        # branchless: one widget call per card, no per-cell status checks.
         status = card_data.get('possession_status', 'N/A')
-        if "Ready" in status:
-            st.success(f"**Status:** {status}", icon="✅")
-        else:
-            st.warning(f"**Status:** {status}", icon="⏳")
+        st.success(f"**Status:** {status}", icon=card_data.get('status_badge', '⏳'))
+
+def cards_from_ids(card_ids):
+    """
+    Materializes card dicts from master-frame row ids. Messages persist only
+    the ids (a few ints) instead of full dict copies, so session state stays
+    small however long the chat runs; the dicts are rebuilt from the shared
+    cached frame just-in-time for rendering.
+    """
+    if not card_ids:
+        return []
+    return load_data().loc[card_ids, CARD_FIELDS].to_dict('records')
+
+@st.fragment
+def render_cards(cards):
+    """
+    Renders the two-column card grid inside a fragment, so any future
+    interaction within the grid reruns just this block instead of the whole
+    script (and every other message's cards) on each event.
+    """
+    cols = st.columns(2)
+    for i, card in enumerate(cards):
+        display_property_card(card, cols[i % 2])
+
+def render_chat_history(messages):
+    """Replays the stored conversation, including any property cards."""
+    for message in messages:
+        avatar = "👤" if message["role"] == "user" else "🤖"
+        with st.chat_message(message["role"], avatar=avatar):
+            st.write(message["content"])
+            if message.get("card_ids"):
+                render_cards(cards_from_ids(message["card_ids"]))
 
 # --- 4. MAIN APP FLOW ---
 
+def append_message(message):
+    """
+    Appends a chat message while keeping the incrementally built prompt
+    context — the formatted history lines and the latest filters — in sync,
+    so no per-turn O(history) rebuild or reverse-scan is needed.
+    """
+    st.session_state.messages.append(message)
+    st.session_state.formatted_lines.append(f"{message['role']}: {message['content']}")
+    if message.get('filters'):
+        st.session_state.last_filters = message['filters']
+
+def recent_history():
+    """
+    Returns the prompt-ready history window: the last few formatted turns,
+    with anything older compressed to the carried filters. Keeps the parser
+    prompt a constant size however long the conversation runs.
+    """
+    lines = st.session_state.formatted_lines
+    recent = lines[-ai_core.HISTORY_WINDOW:]
+    if len(lines) > ai_core.HISTORY_WINDOW:
+        recent = [f"[Earlier: user searched for {json.dumps(st.session_state.last_filters)}]"] + recent
+    return "\n".join(recent)
+
 def main():
     """The main function that orchestrates the application flow."""
     render_sidebar()
     master_df = load_data()
     st.header("Chat With Your Real Estate Assistant")
 
-    if not API_KEY_CONFIGURED and master_df is not None:
-        st.error("Your Google AI API key is not configured. Please set the `GOOGLE_API_KEY` in your .env file.")
-        st.stop()
-    
     if master_df is None:
+        st.error("`data/merged_property_dataset.csv` not found. Please follow the setup instructions in README.md.")
         st.stop()
 
+    if not API_KEY_CONFIGURED:
+        st.error("Your Google AI API key is not configured. Please set the `GOOGLE_API_KEY` in your .env file.")
+        st.stop()
+
+    search_index = load_search_index()
+
+    # setdefault per key: each slot exists independently of the others, so a
+    # partially cleared session never leaves append_message/recent_history
+    # reading attributes that were only set alongside `messages`.
+    st.session_state.setdefault("formatted_lines", [])
+    st.session_state.setdefault("last_filters", {})
+    st.session_state.setdefault("results_offset", 0)
     if "messages" not in st.session_state:
-        st.session_state.messages = [{"role": "assistant", "content": "Hello! How can I help you find your dream home today?", "filters": {}}]
+        st.session_state.messages = []
+        append_message({"role": "assistant", "content": "Hello! How can I help you find your dream home today?", "filters": {}})
 
     # Display chat history
-    for message in st.session_state.messages:
-        avatar = "👤" if message["role"] == "user" else "🤖"
-        with st.chat_message(message["role"], avatar=avatar):
-            st.write(message["content"])
-            if "cards" in message and message["cards"]:
-                cols = st.columns(2)
-                for i, card in enumerate(message["cards"]):
-                    display_property_card(card, cols[i % 2])
+    render_chat_history(st.session_state.messages)
 
     # Handle new user input
     if prompt := st.chat_input("e.g., '2BHK in Mumbai between 1 and 2cr'"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
+        append_message({"role": "user", "content": prompt})
+
         with st.chat_message("user", avatar="👤"):
             st.write(prompt)
 
         with st.chat_message("assistant", avatar="🤖"):
+            # Acknowledgements like "thanks, show more" add no new criteria:
+            # reuse the cached filters and page forward, skipping Gemini.
+            paging = is_followup_acknowledgement(prompt) and st.session_state.last_filters
+
+            # Skip the Gemini parse entirely for chit-chat with no search intent.
+            if not paging and not is_search_query(prompt, known_cities()):
+                summary = "I'm your real estate assistant! Try something like '2BHK in Mumbai between 1 and 2 Cr'."
+                st.write(summary)
+                append_message({"role": "assistant", "content": summary, "card_ids": [], "filters": {}})
+                st.stop()
+
             with st.spinner("Thinking..."):
-                filters = parse_query_with_context(st.session_state.messages)
-                results_df = search_properties(master_df, filters)
-                summary = generate_summary(prompt, results_df)
-                cards_list = results_df.head(6).to_dict('records')
-            
-            st.write(summary)
+                preamble = None
+                if paging:
+                    filters = st.session_state.last_filters
+                    st.session_state.results_offset += RESULTS_PER_PAGE
+                else:
+                    # Simple queries parse locally; only the rest hit Gemini.
+                    filters = ai_core.fast_parse(prompt, st.session_state.last_filters, known_cities())
+                    if filters is None:
+                        filters = dict(cached_parse(
+                            prompt,
+                            recent_history(),
+                            json.dumps(st.session_state.last_filters, sort_keys=True),
+                        ))
+                        preamble = filters.pop('preamble_summary', None)
+                    st.session_state.results_offset = 0
+                results_df = search_properties(master_df, filters, search_index)
+                # Kick off the summary call before materializing cards: the
+                # streaming request goes out on the wire immediately, so the
+                # Gemini round-trip overlaps the local post-processing below
+                # instead of running after it.
+                if not paging:
+                    summary = generate_summary(prompt, results_df, preamble=preamble, stream=True, filters=filters)
+                offset = st.session_state.results_offset
+                card_ids = results_df.index[offset:offset + RESULTS_PER_PAGE].tolist()
+                cards_list = cards_from_ids(card_ids)
+
+            if paging:
+                summary = ("Here are a few more options matching your search." if cards_list
+                           else "That's everything I have for this search — try changing the filters.")
+                st.write(summary)
+            elif isinstance(summary, str):
+                st.write(summary)
+            else:
+                # st.write_stream renders tokens as they arrive and returns
+                # the accumulated text for the history.
+                summary = st.write_stream(summary)
+
             if cards_list:
-                cols = st.columns(2)
-                for i, card in enumerate(cards_list):
-                    display_property_card(card, cols[i % 2])
-            
+                render_cards(cards_list)
+
             # Append the full response to the session state
-            st.session_state.messages.append({
+            append_message({
                 "role": "assistant",
                 "content": summary,
-                "cards": cards_list,
+                "card_ids": card_ids,
                 "filters": filters
             })
 
 if __name__ == "__main__":
     main()
-